@@ -0,0 +1,226 @@
+"""
+A module with a long-running crawl daemon that keeps HTTP and browser resources warm.
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse
+
+from exporters import export_leaflets
+from scraper import Scraper, LeafletScraper, create_session
+
+logger = logging.getLogger('prospekt_scraper')
+
+
+class CrawlTarget:
+    """
+    A URL that is refreshed periodically and exported to its own file.
+    """
+
+    def __init__(self, url: str, output: str, interval: float = 900, jitter: float = 60):
+        self.url = url
+        self.output = output
+        self.interval = interval
+        self.jitter = jitter
+
+    def next_delay(self) -> float:
+        return max(0.0, self.interval + random.uniform(-self.jitter, self.jitter))
+
+
+def _output_name(url: str) -> str:
+    parsed = urlparse(url)
+    slug = re.sub(r'[^\w\-]+', '_', f"{parsed.netloc}{parsed.path}").strip('_')
+    return f"{slug or 'output'}.json"
+
+
+def load_targets(
+    urls: Optional[List[str]] = None,
+    targets_file: Optional[str] = None,
+    output_dir: str = '.',
+    interval: float = 900,
+    jitter: float = 60
+) -> List[CrawlTarget]:
+    """
+    Builds targets from `--url` values and/or a JSON file with a list of
+    {"url", "output", "interval", "jitter"} objects (only "url" is required).
+    """
+    entries: List[Dict[str, Any]] = [{'url': url} for url in urls or []]
+    if targets_file:
+        with open(targets_file, 'r', encoding='utf-8') as f:
+            entries.extend(json.load(f))
+
+    targets = []
+    seen = set()
+    for entry in entries:
+        url = entry['url']
+        if url in seen:
+            logger.warning(f"Duplicate target ignored: {url}")
+            continue
+        seen.add(url)
+        targets.append(CrawlTarget(
+            url=url,
+            output=entry.get('output') or os.path.join(output_dir, _output_name(url)),
+            interval=float(entry.get('interval', interval)),
+            jitter=float(entry.get('jitter', jitter))
+        ))
+    return targets
+
+
+class CrawlDaemon:
+    """
+    Schedules refreshes of several URLs. The requests session is shared by all
+    crawls, and the Playwright browser is started once on a dedicated thread
+    (the sync API is bound to the thread that created it) and reused for every
+    fallback render. A URL is never crawled twice at the same time: the next
+    run is only scheduled once the current one has finished.
+    """
+
+    def __init__(self, targets: List[CrawlTarget], max_workers: int = 4, thumbnail_fetcher=None):
+        self.targets = targets
+        self.max_workers = max_workers
+        self.thumbnail_fetcher = thumbnail_fetcher
+
+        self.session = create_session()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='crawl')
+        self._browser_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='browser')
+        self._playwright = None
+        self._browser = None
+
+        self._schedule: List[tuple] = []
+        self._counter = itertools.count()
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+
+    def _push(self, target: CrawlTarget, delay: float) -> None:
+        with self._lock:
+            heapq.heappush(self._schedule, (time.monotonic() + delay, next(self._counter), target))
+        self._wakeup.set()
+
+    def _get_browser(self):
+        if self._browser is None:
+            from playwright.sync_api import sync_playwright
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch(headless=True)
+            logger.info("Browser started")
+        return self._browser
+
+    def _close_browser(self) -> None:
+        try:
+            if self._browser is not None:
+                self._browser.close()
+            if self._playwright is not None:
+                self._playwright.stop()
+        except Exception as e:
+            logger.error(f"Error closing the browser: {str(e)}")
+        finally:
+            self._browser = None
+            self._playwright = None
+
+    def _render_fallback(self, url: str) -> List[Dict[str, Any]]:
+        scraper = LeafletScraper(url, session=self.session, browser=self._get_browser(), dump_html=False)
+        soup = scraper.get_page(url)
+        if not soup:
+            return []
+        return scraper.extract_leaflets(soup)
+
+    def refresh(self, target: CrawlTarget) -> bool:
+        started = time.monotonic()
+        leaflets = Scraper(target.url, session=self.session, dump_html=False).parse_leaflets()
+
+        if not leaflets and not self._stop.is_set():
+            logger.info(f"Falling back to Playwright for {target.url}")
+            leaflets = self._browser_executor.submit(self._render_fallback, target.url).result()
+
+        if not leaflets:
+            logger.error(f"Unable to obtain prospectuses from {target.url}")
+            return False
+
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for leaflet in leaflets:
+            if "parsed_time" not in leaflet:
+                leaflet["parsed_time"] = timestamp
+
+        if self.thumbnail_fetcher is not None:
+            try:
+                self.thumbnail_fetcher.process(leaflets)
+            except Exception as e:
+                logger.error(f"Error fetching thumbnails for {target.url}: {str(e)}")
+
+        exported = export_leaflets(leaflets, target.output)
+        logger.info(
+            "Refreshed %s: %d leaflets in %.2fs", target.url, len(leaflets), time.monotonic() - started,
+            extra={'event': 'refresh', 'url': target.url, 'count': len(leaflets)}
+        )
+        return exported
+
+    def _run_target(self, target: CrawlTarget) -> None:
+        try:
+            # Обхід, що чекав у черзі до зупинки, не запускається
+            if not self._stop.is_set():
+                self.refresh(target)
+        except Exception as e:
+            logger.error(f"Error refreshing {target.url}: {str(e)}")
+        finally:
+            with self._lock:
+                self._running.discard(target.url)
+            if not self._stop.is_set():
+                self._push(target, target.next_delay())
+
+    def _dispatch_due(self) -> Optional[float]:
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._schedule and self._schedule[0][0] <= now:
+                _, _, target = heapq.heappop(self._schedule)
+                if target.url in self._running:
+                    continue
+                self._running.add(target.url)
+                due.append(target)
+            timeout = self._schedule[0][0] - now if self._schedule else None
+
+        for target in due:
+            self._executor.submit(self._run_target, target)
+        return timeout
+
+    def stop(self, *_args) -> None:
+        self._stop.set()
+        self._wakeup.set()
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        logger.info(f"Daemon started with {len(self.targets)} targets")
+        for target in self.targets:
+            self._push(target, random.uniform(0, target.jitter))
+
+        try:
+            while not self._stop.is_set():
+                self._wakeup.clear()
+                timeout = self._dispatch_due()
+                self._wakeup.wait(timeout)
+            logger.info("Stopping the daemon, waiting for running crawls to finish")
+        finally:
+            # Обходи, що вже виконуються, дописують свої експорти; ті, що чекають у черзі, скасовуються
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            with self._lock:
+                self._running.clear()
+            self._browser_executor.submit(self._close_browser).result()
+            self._browser_executor.shutdown(wait=True)
+            self.session.close()
+            if self.thumbnail_fetcher is not None:
+                self.thumbnail_fetcher.close()
+            logger.info("Daemon stopped")
+        return 0
@@ -4,12 +4,32 @@ A module with classes for exporting data to various formats.
 import json
 import logging
 import os
+import threading
 from typing import List, Dict, Any
 from pathlib import Path
 
 logger = logging.getLogger('prospekt_scraper')
 
 
+def _write_atomic(output_path: str, content: str) -> None:
+    # Тимчасовий файл у тому ж каталозі, щоб os.replace був атомарним і читачі
+    # ніколи не бачили наполовину записаний експорт
+    directory, name = os.path.split(os.path.abspath(output_path))
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 class JSONExporter:
     """
     A class for exporting data to JSON format.
@@ -28,8 +48,7 @@ class JSONExporter:
                 logger.debug(f"Створення директорії: {output_dir}")
                 output_dir.mkdir(parents=True, exist_ok=True)
                 
-            with open(absolute_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            _write_atomic(absolute_path, json.dumps(data, ensure_ascii=False, indent=2))
                 
             logger.info(f"Дані успішно експортовано в {absolute_path}")
             return True
@@ -42,8 +61,7 @@ def export_to_json(data, output_path):
     try:
         os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        _write_atomic(output_path, json.dumps(data, ensure_ascii=False, indent=2))
             
         return True
     except Exception as e:
@@ -62,10 +80,22 @@ def export_to_javascript(data, output_path):
         js_content += f"// Exporting a variable\n"
         js_content += f"export default leaflets;\n"
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(js_content)
+        _write_atomic(output_path, js_content)
             
         return True
     except Exception as e:
         logger.error(f"Error exporting to JavaScript: {str(e)}")
         return False 
+
+def export_leaflets(data, output_path):
+    output_js_path = output_path.replace('.json', '.js') if output_path.endswith('.json') else output_path + '.js'
+    
+    if not export_to_json(data, output_path):
+        return False
+    logger.info(f"Data has been successfully exported to {output_path}")
+    
+    if not export_to_javascript(data, output_js_path):
+        return False
+    logger.info(f"Data has been successfully exported to {output_js_path}")
+    
+    return True
@@ -0,0 +1,284 @@
+"""
+A module with a local stand-in for the leaflet site, used for load and
+fault-injection testing without network access.
+"""
+import hashlib
+import json
+import logging
+import random
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger('prospekt_scraper')
+
+SHOPS = ["Aldi", "Lidl", "Rewe", "Edeka", "Kaufland", "Penny", "Netto", "Norma", "Globus", "Marktkauf"]
+
+
+def _png(width: int, height: int, color: tuple) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    row = b'\x00' + bytes(color) * width
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(row * height))
+        + chunk(b'IEND', b'')
+    )
+
+
+class FakeSiteConfig:
+    """
+    Behaviour of the stand-in site. Error rates are probabilities per request.
+    """
+
+    def __init__(
+        self,
+        leaflets: int = 60,
+        page_size: int = 12,
+        latency: float = 0.05,
+        latency_jitter: float = 0.02,
+        bandwidth: Optional[int] = None,
+        error_429_rate: float = 0.0,
+        error_5xx_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 0
+    ):
+        self.leaflets = leaflets
+        self.page_size = page_size
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        # Загальний ліміт пропускної здатності сервера, байт/с (None - без обмеження)
+        self.bandwidth = bandwidth
+        self.error_429_rate = error_429_rate
+        self.error_5xx_rate = error_5xx_rate
+        self.retry_after = retry_after
+        self.seed = seed
+
+
+class FakeSite:
+    """
+    Serves generated leaflet listings:
+
+    - `/hypermarkte/`: static HTML in the markup `Scraper` looks for;
+    - `/js/`: an empty shell rendered by JavaScript from inline JSON;
+    - `/scroll/`: the first page server-side, further pages fetched from
+      `/api/leaflets?page=N` on scroll, with lazily loaded images;
+    - `/img/<n>.png`: thumbnails.
+
+    All responses carry an ETag and honour `If-None-Match`.
+    """
+
+    def __init__(self, config: Optional[FakeSiteConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.config = config or FakeSiteConfig()
+        self.leaflets = self._generate(self.config)
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._tokens = float(self.config.bandwidth or 0)
+        self._last_refill = time.monotonic()
+        self.stats: Dict[str, int] = {}
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def _generate(config: FakeSiteConfig) -> List[Dict[str, Any]]:
+        rng = random.Random(config.seed)
+        today = datetime.now().date()
+        leaflets = []
+        for i in range(config.leaflets):
+            shop = SHOPS[i % len(SHOPS)]
+            valid_from = today + timedelta(days=rng.randint(-6, 3))
+            leaflets.append({
+                'id': i,
+                'shop_name': shop,
+                'title': f"{shop} Wochenangebote {i + 1}",
+                'valid_from': valid_from.strftime("%d.%m.%Y"),
+                'valid_to': (valid_from + timedelta(days=6)).strftime("%d.%m.%Y"),
+                'thumbnail': f"/img/{i % 16}.png",
+            })
+        return leaflets
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _throttle(self, size: int) -> None:
+        bandwidth = self.config.bandwidth
+        if not bandwidth:
+            return
+        while size > 0:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(bandwidth, self._tokens + (now - self._last_refill) * bandwidth)
+                self._last_refill = now
+                granted = int(min(size, self._tokens))
+                self._tokens -= granted
+            size -= granted
+            if size > 0:
+                time.sleep(min(0.05, size / bandwidth))
+
+    def _inject_fault(self) -> Optional[int]:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.config.error_429_rate:
+            return 429
+        if roll < self.config.error_429_rate + self.config.error_5xx_rate:
+            return 503
+        return None
+
+    @staticmethod
+    def _block_html(leaflet: Dict[str, Any], lazy: bool = False) -> str:
+        img = (
+            f'<img class="lazy" data-src="{leaflet["thumbnail"]}" alt="{leaflet["shop_name"]}">' if lazy
+            else f'<img src="{leaflet["thumbnail"]}" alt="{leaflet["shop_name"]}">'
+        )
+        return (
+            f'<div class="item">{img}'
+            f'<strong>{leaflet["title"]}</strong>'
+            f'<span>{leaflet["valid_from"]} - {leaflet["valid_to"]}</span>'
+            f'<a href="#">Zeige den Prospekt</a></div>'
+        )
+
+    def _page(self, title: str, body: str) -> str:
+        return (
+            f'<!DOCTYPE html><html lang="de"><head><meta charset="utf-8"><title>{title}</title></head>'
+            f'<body><div class="aktuelle-prospekte">{body}</div></body></html>'
+        )
+
+    def render(self, path: str, query: Dict[str, str]) -> Optional[tuple]:
+        """
+        Returns (content type, body) for a path, or None if it does not exist.
+        """
+        if path in ('/', '/hypermarkte/'):
+            blocks = ''.join(self._block_html(leaflet) for leaflet in self.leaflets)
+            return 'text/html; charset=utf-8', self._page('Hypermärkte', blocks).encode('utf-8')
+
+        if path == '/js/':
+            data = json.dumps(self.leaflets, ensure_ascii=False)
+            script = (
+                '<div id="list"></div><script>'
+                f'const leaflets = {data};'
+                'setTimeout(() => { document.getElementById("list").innerHTML = leaflets.map(l => '
+                '`<div class="item"><img src="${l.thumbnail}" alt="${l.shop_name}"><strong>${l.title}</strong>'
+                '<span>${l.valid_from} - ${l.valid_to}</span></div>`).join(""); }, 200);'
+                '</script>'
+            )
+            return 'text/html; charset=utf-8', self._page('Hypermärkte (JS)', script).encode('utf-8')
+
+        if path == '/scroll/':
+            first = ''.join(self._block_html(leaflet, lazy=True) for leaflet in self.leaflets[:self.config.page_size])
+            script = (
+                f'<div id="list">{first}</div><script>'
+                'let page = 1, loading = false, done = false;'
+                'function showImages() { document.querySelectorAll("img.lazy").forEach(img => {'
+                ' if (img.getBoundingClientRect().top < window.innerHeight * 2) { img.src = img.dataset.src; img.classList.remove("lazy"); } }); }'
+                'window.addEventListener("scroll", async () => { showImages();'
+                ' if (loading || done || window.innerHeight + window.scrollY < document.body.scrollHeight - 200) return;'
+                ' loading = true; const r = await fetch(`/api/leaflets?page=${page}`);'
+                ' if (r.ok) { const d = await r.json(); done = !d.has_more; page += 1;'
+                '  document.getElementById("list").insertAdjacentHTML("beforeend", d.html); }'
+                ' loading = false; });'
+                'showImages();</script>'
+            )
+            return 'text/html; charset=utf-8', self._page('Hypermärkte (Scroll)', script).encode('utf-8')
+
+        if path == '/api/leaflets':
+            try:
+                page = int(query.get('page', '0'))
+            except ValueError:
+                page = 0
+            size = self.config.page_size
+            items = self.leaflets[page * size:(page + 1) * size]
+            payload = {
+                'page': page,
+                'has_more': (page + 1) * size < len(self.leaflets),
+                'html': ''.join(self._block_html(leaflet, lazy=True) for leaflet in items),
+            }
+            return 'application/json', json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+        if path.startswith('/img/') and path.endswith('.png'):
+            try:
+                number = int(path[5:-4])
+            except ValueError:
+                return None
+            color = ((number * 53) % 256, (number * 97) % 256, (number * 151) % 256)
+            return 'image/png', _png(320, 240, color)
+
+        return None
+
+    def _make_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                config = site.config
+
+                delay = config.latency + random.uniform(-config.latency_jitter, config.latency_jitter)
+                if delay > 0:
+                    time.sleep(delay)
+
+                fault = site._inject_fault()
+                if fault is not None:
+                    site._count(str(fault))
+                    self._send(fault, b'', 'text/plain', {'Retry-After': str(config.retry_after)})
+                    return
+
+                rendered = site.render(url.path, query)
+                if rendered is None:
+                    site._count('404')
+                    self._send(404, b'not found', 'text/plain')
+                    return
+
+                content_type, body = rendered
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    site._count('304')
+                    self._send(304, b'', content_type, {'ETag': etag})
+                    return
+
+                site._count('200')
+                site._throttle(len(body))
+                self._send(200, body, content_type, {'ETag': etag, 'Cache-Control': 'max-age=0'})
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("Fake site %s", format % args, extra={'event': 'http'})
+
+        return Handler
+
+    def start(self) -> 'FakeSite':
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-site', daemon=True)
+        self._thread.start()
+        logger.info(f"Fake leaflet site listening on {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
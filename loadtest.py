@@ -0,0 +1,173 @@
+"""
+A load-test harness that drives the scrapers against the local fake leaflet site.
+"""
+import argparse
+import json
+import logging
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from fake_site import FakeSite, FakeSiteConfig
+from log_config import setup_logging
+
+logger = logging.getLogger('prospekt_scraper')
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Метод найближчого рангу
+    index = min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LoadTest:
+    """
+    Scrapes the same listing `pages` times with `concurrency` parallel
+    scrapers and collects per-page latency and failures.
+    """
+
+    def __init__(self, url: str, pages: int = 100, concurrency: int = 8, mode: str = 'http'):
+        self.url = url
+        self.pages = pages
+        self.concurrency = concurrency
+        self.mode = mode
+        self.latencies: List[float] = []
+        self.failures = 0
+        self.leaflets = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _scraper(self):
+        # Один скрапер (і пул з'єднань) на потік, як у режимі демона
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            from scraper import Scraper
+            scraper = Scraper(self.url, dump_html=False)
+            scraper.REQUEST_DELAY = (0, 0)
+            self._local.scraper = scraper
+        return scraper
+
+    def _scrape_http(self) -> int:
+        return len(self._scraper().parse_leaflets())
+
+    def _scrape_browser(self, browser) -> int:
+        from scraper import LeafletScraper
+        scraper = LeafletScraper(self.url, browser=browser, dump_html=False)
+        # Паузи імітують користувача на реальному сайті й лише спотворюють вимірювання
+        scraper.RENDER_DELAY = (0, 0)
+        scraper.SCROLL_DELAY = (0, 0)
+        scraper.SCROLL_SETTLE_DELAYS = (0, 0, 0)
+        soup = scraper.get_page(self.url)
+        return len(scraper.extract_leaflets(soup)) if soup else 0
+
+    def _record(self, started: float, found: int) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.leaflets += found
+            if not found:
+                self.failures += 1
+
+    def _run_one(self, _index: int) -> None:
+        started = time.perf_counter()
+        try:
+            found = self._scrape_http()
+        except Exception as e:
+            logger.error(f"Load test request failed: {str(e)}")
+            found = 0
+        self._record(started, found)
+
+    def run(self) -> float:
+        started = time.perf_counter()
+        if self.mode == 'http':
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                list(executor.map(self._run_one, range(self.pages)))
+        else:
+            # Синхронний API Playwright прив'язаний до потоку, тому сторінки рендеряться послідовно
+            from playwright.sync_api import sync_playwright
+            with sync_playwright() as p:
+                browser = p.chromium.launch(headless=True)
+                try:
+                    for _ in range(self.pages):
+                        page_started = time.perf_counter()
+                        try:
+                            found = self._scrape_browser(browser)
+                        except Exception as e:
+                            logger.error(f"Load test render failed: {str(e)}")
+                            found = 0
+                        self._record(page_started, found)
+                finally:
+                    browser.close()
+        return time.perf_counter() - started
+
+    def report(self, duration: float, site_stats: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        site_stats = site_stats or {}
+        injected = sum(count for status, count in site_stats.items() if status in ('429', '503'))
+        pages = len(self.latencies)
+        return {
+            'mode': self.mode,
+            'pages': pages,
+            'concurrency': self.concurrency,
+            'duration_s': round(duration, 3),
+            'pages_per_s': round(pages / duration, 2) if duration else 0.0,
+            'latency_p50_ms': round(_percentile(self.latencies, 50) * 1000, 1),
+            'latency_p99_ms': round(_percentile(self.latencies, 99) * 1000, 1),
+            'latency_max_ms': round(max(self.latencies, default=0) * 1000, 1),
+            'leaflets_per_page': round(self.leaflets / pages, 1) if pages else 0.0,
+            'failed_pages': self.failures,
+            'injected_errors': injected,
+            'success_rate': round((pages - self.failures) / pages, 3) if pages else 0.0,
+            'server_responses': site_stats,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Навантажувальний тест скраперів на локальному сайті')
+    parser.add_argument('--variant', choices=['hypermarkte', 'js', 'scroll'], default='hypermarkte', help='Варіант сторінки')
+    parser.add_argument('--mode', choices=['http', 'browser'], default='http', help='Scraper (HTTP) або LeafletScraper (Playwright)')
+    parser.add_argument('--pages', type=int, default=100, help='Кількість завантажень сторінки')
+    parser.add_argument('--concurrency', type=int, default=8, help='Кількість паралельних скраперів')
+    parser.add_argument('--leaflets', type=int, default=60, help='Кількість проспектів на сторінці')
+    parser.add_argument('--latency', type=float, default=0.05, help='Затримка відповіді сервера, секунди')
+    parser.add_argument('--bandwidth', type=int, default=None, help='Ліміт пропускної здатності сервера, байт/с')
+    parser.add_argument('--error-429', type=float, default=0.0, help='Частка відповідей 429')
+    parser.add_argument('--error-5xx', type=float, default=0.0, help='Частка відповідей 503')
+    parser.add_argument('--retry-after', type=int, default=1, help='Значення заголовка Retry-After, секунди')
+    parser.add_argument('--port', type=int, default=0, help='Порт локального сайту (0 - будь-який вільний)')
+    parser.add_argument('--serve', action='store_true', help='Лише запустити локальний сайт без тесту')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Детальний вивід')
+    args = parser.parse_args()
+
+    setup_logging(verbose=args.verbose, json_output=False)
+
+    site = FakeSite(FakeSiteConfig(
+        leaflets=args.leaflets,
+        latency=args.latency,
+        latency_jitter=args.latency / 2,
+        bandwidth=args.bandwidth,
+        error_429_rate=args.error_429,
+        error_5xx_rate=args.error_5xx,
+        retry_after=args.retry_after
+    ), port=args.port).start()
+
+    try:
+        if args.serve:
+            threading.Event().wait()
+        url = f"{site.base_url}/{args.variant}/"
+        test = LoadTest(url, pages=args.pages, concurrency=args.concurrency, mode=args.mode)
+        duration = test.run()
+        print(json.dumps(test.report(duration, dict(site.stats)), ensure_ascii=False, indent=2))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
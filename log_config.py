@@ -0,0 +1,173 @@
+"""
+A module with the logging setup: a queue-backed handler, JSON output and
+rate limiting for the noisy per-block events.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+# Атрибути стандартного LogRecord, які не потрапляють у структуровані поля
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Події з внутрішніх циклів: (дозволено подій за секунду, максимальний сплеск)
+DEFAULT_RATE_LIMITS = {
+    'block': (5.0, 20),
+    'leaflet_added': (10.0, 50),
+    'selector': (10.0, 50),
+    'thumbnail': (10.0, 50),
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class Lazy:
+    """
+    Defers an expensive computation until the record is actually formatted.
+    """
+
+    __slots__ = ('_func', '_args')
+
+    def __init__(self, func: Callable[..., Any], *args: Any):
+        self._func = func
+        self._args = args
+
+    def __str__(self) -> str:
+        return str(self._func(*self._args))
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats a record as a single JSON line, including any `extra` fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = str(value) if isinstance(value, Lazy) else value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Renders the message and `Lazy` extra fields on the calling thread, so the
+    listener never sees mutable arguments, but keeps `exc_info` (the standard
+    `prepare()` folds the traceback into the message). `prepare()` only runs
+    after the level check and the rate limit filter, so dropped records never
+    evaluate their `Lazy` values.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        for key, value in record.__dict__.items():
+            if isinstance(value, Lazy):
+                record.__dict__[key] = str(value)
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per `event` name. Records without an `event` attribute, or
+    with an event that has no configured limit, always pass. The number of
+    dropped records is attached to the next record that gets through.
+    """
+
+    def __init__(self, limits: Dict[str, tuple]):
+        super().__init__()
+        self.limits = dict(limits)
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, 'event', None)
+        limit = self.limits.get(event) if event else None
+        if limit is None:
+            return True
+
+        rate, burst = limit
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, suppressed = self._buckets.get(event, (burst, now, 0))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens < 1:
+                self._buckets[event] = [tokens, now, suppressed + 1]
+                return False
+            self._buckets[event] = [tokens - 1, now, 0]
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def setup_logging(
+    verbose: bool = False,
+    json_output: bool = True,
+    rate_limits: Optional[Dict[str, tuple]] = None
+) -> logging.handlers.QueueListener:
+    """
+    Configures the root logger once. Records are put on a queue by the calling
+    thread and written to stderr by a background listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    if json_output:
+        formatter: logging.Formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(logging.DEBUG if verbose else logging.INFO)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """
+    Flushes the queue and stops the listener thread.
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
@@ -5,32 +5,31 @@ import json
 from datetime import datetime
 
 from scraper import LeafletScraper
-from exporters import export_to_json, export_to_javascript
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+from exporters import export_leaflets
+from log_config import setup_logging
 
 logger = logging.getLogger(__name__)
 
-def main():
-    parser = argparse.ArgumentParser(description='Скрапер проспектів з сайту')
-    parser.add_argument('-o', '--output', type=str, default='./output.json', help='Шлях до вихідного файлу')
-    parser.add_argument('-v', '--verbose', action='store_true', help='Детальний вивід')
-    args = parser.parse_args()
-    
-    if args.verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
-    
+
+def create_thumbnail_fetcher(args):
+    if not args.thumbnails:
+        return None
+    from thumbnails import ThumbnailFetcher
+    return ThumbnailFetcher(
+        store_dir=args.thumbnails,
+        max_workers=args.thumbnail_workers,
+        small_size=args.thumbnail_size or None
+    )
+
+
+def run_once(args):
     from scraper import Scraper
     scraper_http = Scraper()
-    
+
     try:
         logger.info("Attempting to retrieve prospectuses using HTTP requests...")
         leaflets = scraper_http.parse_leaflets()
-        
+
         if leaflets:
             logger.info(f"Successfully received {len(leaflets)} of prospectuses using HTTP requests")
         else:
@@ -38,30 +37,170 @@ def main():
             from scraper import LeafletScraper
             scraper_playwright = LeafletScraper(verbose=args.verbose)
             leaflets = scraper_playwright.get_leaflets()
-            
+
             if not leaflets:
                 logger.error("Unable to obtain prospectuses")
                 return 1
-        
+
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         for leaflet in leaflets:
             if "parsed_time" not in leaflet:
                 leaflet["parsed_time"] = timestamp
-        
-        output_path = args.output
-        output_js_path = output_path.replace('.json', '.js') if output_path.endswith('.json') else output_path + '.js'
-        
-        export_to_json(leaflets, output_path)
-        logger.info(f"Data has been successfully exported to {output_path}")
-        
-        export_to_javascript(leaflets, output_js_path)
-        logger.info(f"Data has been successfully exported to {output_js_path}")
-        
+
+        fetcher = create_thumbnail_fetcher(args)
+        if fetcher:
+            try:
+                fetcher.process(leaflets)
+            except Exception as e:
+                logger.error(f"Error fetching thumbnails: {str(e)}")
+            finally:
+                fetcher.close()
+
+        export_leaflets(leaflets, args.output)
+
         return 0
-    
+
     except Exception as e:
         logger.error(f"Error while scraping: {str(e)}")
         return 1
 
+
+def run_daemon(args):
+    from daemon import CrawlDaemon, load_targets
+
+    try:
+        targets = load_targets(
+            urls=args.url,
+            targets_file=args.targets,
+            output_dir=args.output_dir,
+            interval=args.interval,
+            jitter=args.jitter
+        )
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Error loading targets: {str(e)}")
+        return 1
+
+    if not targets:
+        logger.error("No targets to crawl, use --url or --targets")
+        return 1
+
+    daemon = CrawlDaemon(targets, max_workers=args.workers, thumbnail_fetcher=create_thumbnail_fetcher(args))
+    return daemon.run()
+
+
+def iso_date(value):
+    from query import parse_date
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"невірна дата '{value}', очікується YYYY-MM-DD")
+
+
+def run_query(args):
+    from query import LeafletIndex, serve
+
+    index = LeafletIndex(args.input or [args.output])
+    if args.http is not None:
+        serve(index, host=args.host, port=args.http)
+        return 0
+
+    leaflets = index.query(date=args.date, date_from=args.date_from, date_to=args.date_to, shop=args.shop)
+    print(json.dumps(leaflets, ensure_ascii=False, indent=2))
+    return 0
+
+
+def run_enqueue(args):
+    from work_queue import WorkQueue
+
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            urls.extend(line.strip() for line in f if line.strip())
+
+    work_queue = WorkQueue(args.queue)
+    added = work_queue.enqueue(urls, requeue=args.requeue)
+    logger.info(f"Added {added} URLs to {args.queue}, queue state: {work_queue.stats()}")
+    return 0
+
+
+def run_worker(args):
+    from work_queue import WorkQueue, CrawlWorker
+
+    work_queue = WorkQueue(args.queue, lease_seconds=args.lease, max_attempts=args.max_attempts)
+    worker = CrawlWorker(work_queue, args.shards, worker_id=args.worker_id)
+    worker.run(wait=args.wait)
+    return 0
+
+
+def run_merge(args):
+    from work_queue import merge_shards
+
+    return 0 if merge_shards(args.shards, args.output) >= 0 else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Скрапер проспектів з сайту')
+    parser.add_argument('-o', '--output', type=str, default='./output.json', help='Шлях до вихідного файлу')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Детальний вивід')
+    parser.add_argument('--log-format', choices=['json', 'text'], default='json', help='Формат логів')
+    parser.add_argument('--thumbnails', type=str, default=None, help='Каталог для локального збереження мініатюр')
+    parser.add_argument('--thumbnail-workers', type=int, default=8, help='Кількість паралельних завантажень мініатюр')
+    parser.add_argument('--thumbnail-size', type=int, default=200, help='Розмір зменшеної мініатюри (0 - не створювати)')
+
+    subparsers = parser.add_subparsers(dest='command')
+    serve_parser = subparsers.add_parser('serve', aliases=['daemon'], help='Періодичне оновлення в режимі демона')
+    serve_parser.add_argument('--url', action='append', default=[], help='URL для оновлення (можна вказати кілька разів)')
+    serve_parser.add_argument('--targets', type=str, default=None, help='JSON-файл зі списком URL та інтервалів')
+    serve_parser.add_argument('--output-dir', type=str, default='.', help='Каталог для експорту результатів')
+    serve_parser.add_argument('--interval', type=float, default=900, help='Інтервал оновлення в секундах')
+    serve_parser.add_argument('--jitter', type=float, default=60, help='Випадкове відхилення інтервалу в секундах')
+    serve_parser.add_argument('--workers', type=int, default=4, help='Кількість одночасних обходів')
+
+    query_parser = subparsers.add_parser('query', help='Пошук серед експортованих проспектів')
+    query_parser.add_argument('--input', action='append', default=[], help='JSON-файл або каталог з експортами (можна вказати кілька разів)')
+    query_parser.add_argument('--date', type=iso_date, default=None, help='Проспекти, дійсні на дату (YYYY-MM-DD)')
+    query_parser.add_argument('--from', dest='date_from', type=iso_date, default=None, help='Початок періоду (YYYY-MM-DD)')
+    query_parser.add_argument('--to', dest='date_to', type=iso_date, default=None, help='Кінець періоду (YYYY-MM-DD)')
+    query_parser.add_argument('--shop', type=str, default=None, help='Назва магазину')
+    query_parser.add_argument('--http', type=int, default=None, metavar='PORT', help='Запустити локальний HTTP API на порту')
+    query_parser.add_argument('--host', type=str, default='127.0.0.1', help='Адреса для HTTP API')
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Додати URL до спільної черги')
+    enqueue_parser.add_argument('urls', nargs='*', help='URL для обходу')
+    enqueue_parser.add_argument('--file', type=str, default=None, help='Файл зі списком URL (по одному на рядок)')
+    enqueue_parser.add_argument('--queue', type=str, default='./queue.db', help='Шлях до файлу черги SQLite')
+    enqueue_parser.add_argument('--requeue', action='store_true', help='Повернути в чергу вже оброблені URL')
+
+    worker_parser = subparsers.add_parser('worker', help='Обробляти URL зі спільної черги')
+    worker_parser.add_argument('--queue', type=str, default='./queue.db', help='Шлях до файлу черги SQLite')
+    worker_parser.add_argument('--shards', type=str, default='./shards', help='Каталог для результатів воркерів')
+    worker_parser.add_argument('--worker-id', type=str, default=None, help='Ідентифікатор воркера')
+    worker_parser.add_argument('--lease', type=float, default=120, help='Тривалість оренди в секундах')
+    worker_parser.add_argument('--max-attempts', type=int, default=3, help='Максимальна кількість спроб для URL')
+    worker_parser.add_argument('--wait', action='store_true', help='Чекати на нові URL замість завершення')
+
+    merge_parser = subparsers.add_parser('merge', help='Об\'єднати результати воркерів в експорт')
+    merge_parser.add_argument('--shards', type=str, default='./shards', help='Каталог з результатами воркерів')
+    args = parser.parse_args()
+
+    setup_logging(verbose=args.verbose, json_output=args.log_format == 'json')
+
+    if args.command in ('serve', 'daemon'):
+        return run_daemon(args)
+    if args.command == 'query':
+        from query import validate_range
+        try:
+            validate_range(args.date, args.date_from, args.date_to)
+        except ValueError as e:
+            query_parser.error(str(e))
+        return run_query(args)
+    if args.command == 'enqueue':
+        return run_enqueue(args)
+    if args.command == 'worker':
+        return run_worker(args)
+    if args.command == 'merge':
+        return run_merge(args)
+    return run_once(args)
+
 if __name__ == "__main__":
-    sys.exit(main()) 
+    sys.exit(main())
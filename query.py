@@ -0,0 +1,265 @@
+"""
+A module with an in-memory index over exported leaflets and a small local HTTP API.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger('prospekt_scraper')
+
+
+def parse_date(value: str) -> str:
+    """
+    Validates a zero-padded YYYY-MM-DD date. Dates are compared as strings in
+    the index, so any other form (including `2025-3-5`, which strptime accepts)
+    would match silently.
+    """
+    if datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d") != value:
+        raise ValueError(f"date '{value}' is not in YYYY-MM-DD format")
+    return value
+
+
+def validate_range(
+    date: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Turns query parameters into a validated (start, end) pair. Raises
+    ValueError on malformed dates or when `date_from` is after `date_to`.
+    """
+    if date:
+        if date_from or date_to:
+            raise ValueError("date cannot be combined with from/to")
+        day = parse_date(date)
+        return day, day
+
+    start = parse_date(date_from) if date_from else None
+    end = parse_date(date_to) if date_to else None
+    if start and end and start > end:
+        raise ValueError(f"from ({start}) is after to ({end})")
+    return start, end
+
+
+class _IntervalNode:
+    """
+    A node of a centered interval tree. Intervals are (start, end, record_id)
+    tuples with ISO dates, which compare correctly as strings.
+    """
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, intervals: List[Tuple[str, str, int]]):
+        points = sorted([i[0] for i in intervals] + [i[1] for i in intervals])
+        self.center = points[len(points) // 2]
+
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+
+        self.by_start = sorted(here, key=lambda i: i[0])
+        self.by_end = sorted(here, key=lambda i: i[1], reverse=True)
+        self.left = _IntervalNode(left) if left else None
+        self.right = _IntervalNode(right) if right else None
+
+    def overlapping(self, start: str, end: str, result: List[int]) -> None:
+        node = self
+        while node is not None:
+            if end < node.center:
+                for interval in node.by_start:
+                    if interval[0] > end:
+                        break
+                    result.append(interval[2])
+                node = node.left
+            elif start > node.center:
+                for interval in node.by_end:
+                    if interval[1] < start:
+                        break
+                    result.append(interval[2])
+                node = node.right
+            else:
+                result.extend(interval[2] for interval in node.by_start)
+                if node.left is not None:
+                    node.left.overlapping(start, end, result)
+                node = node.right
+
+
+class _SourceIndex:
+    """
+    The index of a single export file. It is rebuilt as a whole when the file
+    changes, other sources are left untouched.
+    """
+
+    def __init__(self, path: str, signature: Tuple[int, int], records: List[Dict[str, Any]]):
+        self.path = path
+        self.signature = signature
+        self.records = records
+        self.by_shop: Dict[str, List[int]] = {}
+        intervals = []
+        shop_intervals: Dict[str, List[Tuple[str, str, int]]] = {}
+
+        for record_id, record in enumerate(records):
+            shop = (record.get('shop_name') or '').lower()
+            self.by_shop.setdefault(shop, []).append(record_id)
+            valid_from, valid_to = record.get('valid_from'), record.get('valid_to')
+            if valid_from and valid_to:
+                interval = (min(valid_from, valid_to), max(valid_from, valid_to), record_id)
+                intervals.append(interval)
+                shop_intervals.setdefault(shop, []).append(interval)
+
+        # Окреме дерево для кожного магазину, щоб запит "магазин + дата" не фільтрував усі записи
+        self.tree = _IntervalNode(intervals) if intervals else None
+        self.shop_trees = {shop: _IntervalNode(items) for shop, items in shop_intervals.items()}
+
+    def query(self, start: Optional[str], end: Optional[str], shop: Optional[str]) -> List[Dict[str, Any]]:
+        if start is None and end is None:
+            ids = self.by_shop.get(shop.lower(), []) if shop else range(len(self.records))
+            return [self.records[i] for i in ids]
+
+        ids: List[int] = []
+        tree = self.shop_trees.get(shop.lower()) if shop else self.tree
+        if tree is not None:
+            tree.overlapping(start or '0000-00-00', end or '9999-99-99', ids)
+        ids.sort()
+        return [self.records[i] for i in ids]
+
+
+class LeafletIndex:
+    """
+    Shop and validity-interval index over one or more exported JSON files or
+    directories with them. `refresh()` only re-reads files whose modification
+    time or size changed, so it is cheap to call before every query.
+    """
+
+    def __init__(self, inputs: List[str], min_check_interval: float = 1.0):
+        self.inputs = inputs
+        self.min_check_interval = min_check_interval
+        self._sources: Dict[str, _SourceIndex] = {}
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+
+    def _input_files(self) -> List[str]:
+        files = []
+        for item in self.inputs:
+            path = Path(item)
+            if path.is_dir():
+                files.extend(str(p) for p in sorted(path.glob('*.json')))
+            elif path.exists():
+                files.append(str(path))
+        return files
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_check < self.min_check_interval:
+            return
+
+        with self._lock:
+            self._last_check = now
+            files = self._input_files()
+            for path in set(self._sources) - set(files):
+                logger.info(f"Removing {path} from the index")
+                del self._sources[path]
+
+            for path in files:
+                try:
+                    # Наносекунди й розмір: st_mtime у float і грубі часові мітки ФС
+                    # пропускають перезаписи в межах одного тіку
+                    stat = os.stat(path)
+                    signature = (stat.st_mtime_ns, stat.st_size)
+                    source = self._sources.get(path)
+                    if source is not None and source.signature == signature:
+                        continue
+                    with open(path, 'r', encoding='utf-8') as f:
+                        records = json.load(f)
+                    if not isinstance(records, list):
+                        continue
+                    self._sources[path] = _SourceIndex(path, signature, records)
+                    logger.info(f"Indexed {len(records)} leaflets from {path}")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error indexing {path}: {str(e)}")
+
+    def query(
+        self,
+        date: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        shop: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns leaflets valid on `date`, or overlapping [`date_from`, `date_to`]
+        (either end may be open), optionally restricted to a shop. Raises
+        ValueError for invalid dates.
+        """
+        date_from, date_to = validate_range(date, date_from, date_to)
+        self.refresh()
+
+        with self._lock:
+            sources = list(self._sources.values())
+        result = []
+        for source in sources:
+            result.extend(source.query(date_from, date_to, shop))
+        return result
+
+
+def _make_handler(index: LeafletIndex):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path not in ('/', '/leaflets'):
+                self._send(404, {'error': 'not found'})
+                return
+
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            started = time.perf_counter()
+            try:
+                leaflets = index.query(
+                    date=params.get('date'),
+                    date_from=params.get('from'),
+                    date_to=params.get('to'),
+                    shop=params.get('shop')
+                )
+            except ValueError as e:
+                self._send(400, {'error': str(e)})
+                return
+            self._send(200, {
+                'count': len(leaflets),
+                'took_ms': round((time.perf_counter() - started) * 1000, 3),
+                'leaflets': leaflets
+            })
+
+        def _send(self, status: int, payload: Dict[str, Any]):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("HTTP %s", format % args, extra={'event': 'http'})
+
+    return QueryHandler
+
+
+def serve(index: LeafletIndex, host: str = '127.0.0.1', port: int = 8080) -> None:
+    index.refresh(force=True)
+    server = ThreadingHTTPServer((host, port), _make_handler(index))
+    logger.info(f"Query API listening on http://{host}:{port}/leaflets")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -18,15 +18,66 @@ from datetime import datetime, timedelta
 from urllib.parse import urljoin, urlparse
 import httpx
 from models import Leaflet
+from log_config import Lazy
 from utils import parse_date_range, validate_url
 
 logger = logging.getLogger('prospekt_scraper')
 
 
+def create_session() -> requests.Session:
+    session = requests.Session()
+    retry_strategy = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"]
+    )
+    
+    adapter = HTTPAdapter(max_retries=retry_strategy)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+        'Accept-Language': 'de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Cache-Control': 'no-cache',
+        'Pragma': 'no-cache',
+        'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+        'Sec-Ch-Ua-Mobile': '?0',
+        'Sec-Ch-Ua-Platform': '"Windows"',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Upgrade-Insecure-Requests': '1'
+    })
+    
+    return session
+
+
 class Scraper:
-    def __init__(self, base_url: str = 'https://www.prospektmaschine.de/hypermarkte/'):
+    # Селектори блоків проспектів
+    BLOCK_SELECTORS = [
+        "div.item", "article", ".aktuelle-prospekte-item", 
+        ".prospekte-block", ".grid-item", ".aktuelle-prospekte .item",
+        ".leaflet-preview-container", ".prospekt-container", "article.leaflet",
+        "div[class*='leaflet']", "div[class*='prospekt']",
+        ".col-md-3", ".col-sm-4"
+    ]
+    # Пауза перед кожним запитом, секунди (min, max)
+    REQUEST_DELAY = (2, 5)
+
+    def __init__(
+        self,
+        base_url: str = 'https://www.prospektmaschine.de/hypermarkte/',
+        session: Optional[requests.Session] = None,
+        dump_html: Optional[bool] = None
+    ):
         self.base_url = base_url
-        self.session = self._create_session()
+        self.session = session or self._create_session()
+        # None - зберігати HTML лише при рівні логування DEBUG
+        self.dump_html = dump_html
         # Список відомих супермаркетів для розпізнавання
         self.known_shops = [
             "Aldi", "Lidl", "Rewe", "Edeka", "Kaufland", "Penny", "Netto", 
@@ -37,45 +88,26 @@ class Scraper:
         ]
         
     def _create_session(self) -> requests.Session:
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=5,
-            backoff_factor=0.5,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["GET"]
-        )
-        
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Accept-Language': 'de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Cache-Control': 'no-cache',
-            'Pragma': 'no-cache',
-            'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-            'Sec-Ch-Ua-Mobile': '?0',
-            'Sec-Ch-Ua-Platform': '"Windows"',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Upgrade-Insecure-Requests': '1'
-        })
-        
-        return session
-        
+        return create_session()
+
+    def _dump_enabled(self) -> bool:
+        # Дампи сторінок лише для відлагодження: у режимі демона/воркерів їх вимкнено
+        return self.dump_html if self.dump_html is not None else logger.isEnabledFor(logging.DEBUG)
+
+    def _dump_html(self, filename: str, html: str) -> None:
+        if not self._dump_enabled():
+            return
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(html)
+        logger.debug(f"Збережено HTML для відлагодження в {filename}")
+
     def get_page(self, url: str) -> Optional[BeautifulSoup]:
         try:
             logger.info(f"Завантаження сторінки: {url}")
-            time.sleep(random.uniform(2, 5))         
+            time.sleep(random.uniform(*self.REQUEST_DELAY))         
             response = self.session.get(url, timeout=15)
             response.raise_for_status()       
-            with open('debug.html', 'w', encoding='utf-8') as f:
-                f.write(response.text)
-            logger.debug(f"Збережено HTML для відлагодження в debug.html")
+            self._dump_html('debug.html', response.text)
             
             return BeautifulSoup(response.text, 'lxml')
             
@@ -135,12 +167,14 @@ class Scraper:
             logger.error("Не вдалося завантажити основну сторінку")
             return []
             
+        return self.extract_leaflets(soup)
+
+    def extract_leaflets(self, soup: BeautifulSoup) -> List[Dict[str, Any]]:
         leaflets = []
         
         try:
-            with open('full_page.html', 'w', encoding='utf-8') as f:
-                f.write(str(soup))
-            logger.debug("Збережено повний HTML в full_page.html")
+            if self._dump_enabled():
+                self._dump_html('full_page.html', str(soup))
             prospekt_blocks = []
             vorschau_blocks = soup.find_all(lambda tag: tag.name and "Vorschau" in tag.text and "Prospekt" in tag.text)
             if vorschau_blocks:
@@ -153,18 +187,11 @@ class Scraper:
                     parent = button.parent
                     if parent and parent not in prospekt_blocks:
                         prospekt_blocks.append(parent)
-            selectors = [
-                "div.item", "article", ".aktuelle-prospekte-item", 
-                ".prospekte-block", ".grid-item", ".aktuelle-prospekte .item",
-                ".leaflet-preview-container", ".prospekt-container", "article.leaflet",
-                "div[class*='leaflet']", "div[class*='prospekt']",
-                ".col-md-3", ".col-sm-4"
-            ]
-            
-            for selector in selectors:
+            for selector in self.BLOCK_SELECTORS:
                 blocks = soup.select(selector)
                 if blocks:
-                    logger.info(f"Знайдено {len(blocks)} блоків з селектором: {selector}")
+                    logger.info("Знайдено %d блоків з селектором: %s", len(blocks), selector,
+                                extra={'event': 'selector', 'selector': selector, 'count': len(blocks)})
                     for block in blocks:
                         if block not in prospekt_blocks:
                             prospekt_blocks.append(block)
@@ -172,7 +199,8 @@ class Scraper:
             
             for i, block in enumerate(prospekt_blocks):
                 try:
-                    logger.debug(f"Обробка блоку {i+1}:\n{block}")
+                    logger.debug("Обробка блоку %d:\n%s", i + 1, Lazy(str, block),
+                                 extra={'event': 'block', 'index': i + 1})
                     img = block.find("img")
                     img_src = self._get_image_url(img, self.base_url) if img else ""
                     if not img_src:
@@ -200,7 +228,8 @@ class Scraper:
                     )
                     
                     leaflets.append(leaflet.to_dict())
-                    logger.info(f"Added a prospectus: {title} ({valid_from} - {valid_to})")
+                    logger.info("Added a prospectus: %s (%s - %s)", title, valid_from, valid_to,
+                                extra={'event': 'leaflet_added', 'shop_name': shop_name})
                     
                 except Exception as e:
                     logger.error(f"Error processing a prospectus block {i+1}: {str(e)}")
@@ -215,6 +244,27 @@ class Scraper:
 
 
 class LeafletScraper(Scraper):
+    # Пауза після завантаження сторінки в браузері, секунди (min, max)
+    RENDER_DELAY = (1.0, 2.0)
+    # Кроки прокрутки та пауза після кожного кроку, секунди (min, max)
+    SCROLL_STEPS = 10
+    SCROLL_DELAY = (0.5, 1.0)
+    # Паузи після трьох завершальних прокруток, секунди
+    SCROLL_SETTLE_DELAYS = (1, 0.5, 1)
+
+    def __init__(
+        self,
+        base_url: str = 'https://www.prospektmaschine.de/hypermarkte/',
+        session: Optional[requests.Session] = None,
+        verbose: bool = False,
+        browser=None,
+        dump_html: Optional[bool] = None
+    ):
+        super().__init__(base_url, session, dump_html)
+        self.verbose = verbose
+        # Вже запущений браузер (режим демона); інакше запускається на кожен запит
+        self.browser = browser
+
     def get_page(self, url: str) -> Optional[BeautifulSoup]:
         try:
             html = self.get_page_playwright(url)
@@ -227,62 +277,69 @@ class LeafletScraper(Scraper):
     
     def get_page_playwright(self, url: str) -> Optional[str]:
         try:
+            if self.browser is not None:
+                return self._render_page(self.browser, url)
+
             with async_playwright() as p:
                 browser = p.chromium.launch(headless=True)
-                browser_context = browser.new_context(
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                    locale="de-DE",
-                    viewport={"width": 1920, "height": 1080},
-                    extra_http_headers={
-                        "Accept-Language": "de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7"
-                    }
-                )
-                
-                page = browser_context.new_page()
-                page.set_default_timeout(60000)  
-                
-                logger.info(f"Відкриваю сторінку {url}")
-                response = page.goto(url, wait_until="networkidle")
-                
-                if not response:
-                    logger.error("Page loading error")
-                    browser.close()
-                    return None
-                
-                if response.status >= 400:
-                    logger.error(f"HTTP error: {response.status}")
+                try:
+                    return self._render_page(browser, url)
+                finally:
                     browser.close()
-                    return None
-                
-                time.sleep(random.uniform(1.0, 2.0))
-                self._scroll_page(page)
-                html = page.content()
-                with open('debug_playwright.html', 'w', encoding='utf-8') as f:
-                    f.write(html)
-                logger.debug("Saved HTML from Playwright to debug_playwright.html")
-                
-                browser.close()
-                return html
                 
         except Exception as e:
             logger.error(f"Error using Playwright: {str(e)}")
             return None
+
+    def _render_page(self, browser, url: str) -> Optional[str]:
+        browser_context = browser.new_context(
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            locale="de-DE",
+            viewport={"width": 1920, "height": 1080},
+            extra_http_headers={
+                "Accept-Language": "de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7"
+            }
+        )
+        try:
+            page = browser_context.new_page()
+            page.set_default_timeout(60000)  
+            
+            logger.info(f"Відкриваю сторінку {url}")
+            response = page.goto(url, wait_until="networkidle")
+            
+            if not response:
+                logger.error("Page loading error")
+                return None
+            
+            if response.status >= 400:
+                logger.error(f"HTTP error: {response.status}")
+                return None
+            
+            time.sleep(random.uniform(*self.RENDER_DELAY))
+            self._scroll_page(page)
+            html = page.content()
+            self._dump_html('debug_playwright.html', html)
+            
+            return html
+        finally:
+            browser_context.close()
             
     def _scroll_page(self, page):
         try:
             height = page.evaluate("document.body.scrollHeight")
             logger.info("Прокручую сторінку для завантаження контенту")
             
-            steps = 10
+            steps = self.SCROLL_STEPS
             for i in range(1, steps + 1):
                 page.evaluate(f"window.scrollTo(0, {height * i / steps})")
-                time.sleep(random.uniform(0.5, 1.0))
+                time.sleep(random.uniform(*self.SCROLL_DELAY))
+            settle_bottom, settle_back, settle_final = self.SCROLL_SETTLE_DELAYS
             page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(1)
+            time.sleep(settle_bottom)
             page.evaluate("window.scrollTo(0, document.body.scrollHeight * 0.7)")
-            time.sleep(0.5)
+            time.sleep(settle_back)
             page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(1)
+            time.sleep(settle_final)
             
         except Exception as e:
             logger.error(f"Error when scrolling the page: {str(e)}")
@@ -327,7 +384,8 @@ class LeafletScraper(Scraper):
                 for selector_group in selector_groups:
                     for selector in selector_group:
                         try:
-                            logger.info(f"Searching for prospectuses by selector: {selector}")
+                            logger.debug("Searching for prospectuses by selector: %s", selector,
+                                         extra={'event': 'selector', 'selector': selector})
                             
                             if selector.startswith('//'):
         
@@ -337,13 +395,15 @@ class LeafletScraper(Scraper):
                                 
                             count = items.count()
                             if count > 0:
-                                logger.info(f"Found {count} items by selector {selector}")
+                                logger.info("Found %d items by selector %s", count, selector,
+                                            extra={'event': 'selector', 'selector': selector, 'count': count})
                                 for i in range(min(count, 10)):
                                     try:
                                         item = items.nth(i)
                                         item_html = item.evaluate("el => el.outerHTML")
                                         item_soup = BeautifulSoup(item_html, 'html.parser')
-                                        logger.debug(f"Елемент {i+1}: {item_html[:200]}...")
+                                        logger.debug("Елемент %d: %.200s...", i + 1, item_html,
+                                                     extra={'event': 'block', 'index': i + 1})
                                         img = item_soup.find("img")
                                         img_src = self._get_image_url(img, self.base_url) if img else ""
                                         texts = [t.strip() for t in item_soup.stripped_strings if t.strip()]
@@ -388,7 +448,8 @@ class LeafletScraper(Scraper):
                                         leaflet_dict = leaflet.to_dict()
                                         if leaflet_dict not in leaflets: 
                                             leaflets.append(leaflet_dict)
-                                            logger.info(f"Додано проспект: {title} ({valid_from} - {valid_to})")
+                                            logger.info("Додано проспект: %s (%s - %s)", title, valid_from, valid_to,
+                                                        extra={'event': 'leaflet_added', 'shop_name': shop_name})
                                         
                                     except Exception as e:
                                         logger.error(f"Error processing an element {i+1}: {str(e)}")
@@ -428,7 +489,8 @@ class LeafletScraper(Scraper):
                                     "alt": alt,
                                     "index": i
                                 })
-                                logger.debug(f"A suitable image {i}: {src}")
+                                logger.debug("A suitable image %d: %s", i, src,
+                                             extra={'event': 'block', 'index': i})
                         except Exception as e:
                             logger.error(f"Error checking the image {i}: {str(e)}")
                             continue
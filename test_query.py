@@ -0,0 +1,117 @@
+import json
+import os
+import random
+import socket
+import threading
+import urllib.error
+import urllib.request
+from datetime import date, timedelta
+
+import pytest
+
+from query import LeafletIndex, parse_date, serve, validate_range
+
+
+def _records(count, seed=1):
+    rng = random.Random(seed)
+    start = date(2025, 1, 1)
+    records = []
+    for i in range(count):
+        valid_from = start + timedelta(days=rng.randint(0, 120))
+        valid_to = valid_from + timedelta(days=rng.randint(0, 14))
+        records.append({
+            "title": f"Prospekt {i}",
+            "shop_name": rng.choice(["Aldi", "Lidl", "EDEKA"]),
+            "valid_from": valid_from.isoformat(),
+            "valid_to": valid_to.isoformat(),
+        })
+    return records
+
+
+@pytest.fixture
+def index(tmp_path):
+    records = _records(2000)
+    (tmp_path / "output.json").write_text(json.dumps(records), encoding="utf-8")
+    return LeafletIndex([str(tmp_path)]), records
+
+
+def test_range_query_matches_brute_force(index):
+    idx, records = index
+    rng = random.Random(2)
+    for _ in range(300):
+        a = date(2024, 12, 25) + timedelta(days=rng.randint(0, 150))
+        b = a + timedelta(days=rng.randint(0, 30))
+        shop = rng.choice([None, "aldi", "Lidl"])
+        expected = [
+            r for r in records
+            if r["valid_from"] <= b.isoformat() and r["valid_to"] >= a.isoformat()
+            and (shop is None or r["shop_name"].lower() == shop.lower())
+        ]
+        assert idx.query(date_from=a.isoformat(), date_to=b.isoformat(), shop=shop) == expected
+
+
+def test_point_and_open_ended_queries(index):
+    idx, records = index
+    day = "2025-02-10"
+    assert idx.query(date=day) == [r for r in records if r["valid_from"] <= day <= r["valid_to"]]
+    assert idx.query(date_from=day) == [r for r in records if r["valid_to"] >= day]
+    assert idx.query(date_to=day) == [r for r in records if r["valid_from"] <= day]
+    assert idx.query(shop="EDEKA") == [r for r in records if r["shop_name"] == "EDEKA"]
+
+
+def test_refresh_picks_up_changed_file(tmp_path):
+    path = tmp_path / "output.json"
+    path.write_text(json.dumps(_records(10)), encoding="utf-8")
+    idx = LeafletIndex([str(path)], min_check_interval=0)
+    assert len(idx.query()) == 10
+
+    path.write_text(json.dumps(_records(3)), encoding="utf-8")
+    os.utime(path, (0, 0))
+    assert len(idx.query()) == 3
+
+
+def test_refresh_detects_rewrite_with_same_mtime(tmp_path):
+    path = tmp_path / "output.json"
+    path.write_text(json.dumps(_records(10)), encoding="utf-8")
+    os.utime(path, ns=(1, 1))
+    idx = LeafletIndex([str(path)], min_check_interval=0)
+    assert len(idx.query()) == 10
+
+    path.write_text(json.dumps(_records(3)), encoding="utf-8")
+    os.utime(path, ns=(1, 1))
+    assert len(idx.query()) == 3
+
+
+@pytest.mark.parametrize("value", ["18.03.2025", "2025-3-5", "2025-02-30", ""])
+def test_invalid_dates_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_date(value)
+
+
+def test_from_after_to_is_rejected():
+    with pytest.raises(ValueError):
+        validate_range(date_from="2025-03-20", date_to="2025-03-10")
+    assert validate_range(date="2025-03-10") == ("2025-03-10", "2025-03-10")
+
+
+def test_http_api_returns_400_on_bad_date(index):
+    idx, _ = index
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    threading.Thread(target=serve, args=(idx, "127.0.0.1", port), daemon=True).start()
+
+    base = f"http://127.0.0.1:{port}/leaflets"
+    for _ in range(50):
+        try:
+            with urllib.request.urlopen(f"{base}?date=2025-02-10&shop=Aldi") as response:
+                payload = json.load(response)
+            break
+        except urllib.error.URLError:
+            threading.Event().wait(0.05)
+    assert payload["count"] == len(idx.query(date="2025-02-10", shop="Aldi"))
+
+    for query in ("date=18.03.2025", "from=2025-03-20&to=2025-03-10"):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base}?{query}")
+        assert error.value.code == 400
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+from work_queue import CrawlWorker, WorkQueue, merge_shards
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return WorkQueue(str(tmp_path / "queue.db"), lease_seconds=60, max_attempts=2, clock=clock)
+
+
+def test_enqueue_ignores_known_urls(queue):
+    assert queue.enqueue(["http://a/", "http://b/"]) == 2
+    assert queue.enqueue(["http://a/"]) == 0
+    assert queue.stats() == {"pending": 2}
+
+
+def test_claim_expiry_reclaim_failed(queue, clock):
+    queue.enqueue(["http://a/"])
+
+    assert queue.claim("w1") == "http://a/"
+    assert queue.claim("w2") is None
+    assert queue.stats() == {"leased": 1}
+
+    clock.now += 61
+    assert queue.claim("w2") == "http://a/"
+    assert not queue.heartbeat("http://a/", "w1")
+    assert queue.heartbeat("http://a/", "w2")
+
+    clock.now += 61
+    assert queue.claim("w3") is None
+    assert queue.stats() == {"failed": 1}
+    assert not queue.has_open_items()
+
+
+def test_heartbeat_keeps_lease(queue, clock):
+    queue.enqueue(["http://a/"])
+    assert queue.claim("w1") == "http://a/"
+
+    clock.now += 50
+    assert queue.heartbeat("http://a/", "w1")
+    clock.now += 50
+    assert queue.claim("w2") is None
+
+
+def test_fail_requeues_until_max_attempts(queue):
+    queue.enqueue(["http://a/"])
+
+    assert queue.claim("w1") == "http://a/"
+    queue.fail("http://a/", "w1", "boom")
+    assert queue.stats() == {"pending": 1}
+
+    assert queue.claim("w1") == "http://a/"
+    queue.fail("http://a/", "w1", "boom")
+    assert queue.stats() == {"failed": 1}
+
+    queue.enqueue(["http://a/"], requeue=True)
+    assert queue.stats() == {"pending": 1}
+
+
+def test_complete_ignores_foreign_owner(queue, clock):
+    queue.enqueue(["http://a/"])
+    queue.claim("w1")
+    clock.now += 61
+    queue.claim("w2")
+
+    queue.complete("http://a/", "w1")
+    assert queue.stats() == {"leased": 1}
+    queue.complete("http://a/", "w2")
+    assert queue.stats() == {"done": 1}
+
+
+def _leaflet(title):
+    return {"title": title, "shop_name": "Aldi", "valid_from": "2025-03-10", "valid_to": "2025-03-16", "thumbnail": ""}
+
+
+def test_process_writes_shard_and_completes(queue, tmp_path, monkeypatch):
+    queue.enqueue(["http://a/"])
+    worker = CrawlWorker(queue, str(tmp_path / "shards"), worker_id="w1")
+    monkeypatch.setattr(worker, "_crawl", lambda url: [_leaflet("A")])
+
+    assert worker.run() == 1
+    assert queue.stats() == {"done": 1}
+    lines = worker.shard_path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["source_url"] for line in lines] == ["http://a/"]
+
+
+def test_merge_keeps_only_latest_crawl_per_url(queue, tmp_path, clock):
+    shards = tmp_path / "shards"
+    old = CrawlWorker(queue, str(shards), worker_id="old")
+    new = CrawlWorker(queue, str(shards), worker_id="new")
+
+    old._write_shard("http://a/", [_leaflet("Expired"), _leaflet("Kept")])
+    old._write_shard("http://b/", [_leaflet("Other")])
+    clock.now += 900
+    new._write_shard("http://a/", [_leaflet("Kept"), _leaflet("Fresh")])
+    with open(new.shard_path, "a", encoding="utf-8") as f:
+        f.write('{"title": "trunc')
+
+    output = tmp_path / "output.json"
+    assert merge_shards(str(shards), str(output)) == 3
+    merged = json.loads(output.read_text(encoding="utf-8"))
+    assert sorted(leaflet["title"] for leaflet in merged) == ["Fresh", "Kept", "Other"]
+    assert all("crawl_id" not in leaflet for leaflet in merged)
+
+
+@pytest.mark.parametrize("content", [None, "", '{"title": "trunc'])
+def test_merge_without_records_keeps_previous_export(tmp_path, content):
+    shards = tmp_path / "shards"
+    if content is not None:
+        shards.mkdir()
+        (shards / "w1.jsonl").write_text(content, encoding="utf-8")
+    output = tmp_path / "output.json"
+    output.write_text("[1]", encoding="utf-8")
+
+    assert merge_shards(str(shards), str(output)) == -1
+    assert output.read_text(encoding="utf-8") == "[1]"
+    assert not (tmp_path / "output.js").exists()
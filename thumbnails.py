@@ -0,0 +1,215 @@
+"""
+A module for downloading leaflet thumbnails into a local content-addressed store.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger('prospekt_scraper')
+
+_CONTENT_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+}
+
+
+class ThumbnailFetcher:
+    """
+    Downloads thumbnails concurrently and stores each image once under its
+    SHA-256 hash. Validators (ETag/Last-Modified) are kept in a manifest so that
+    repeated runs only issue conditional requests.
+    """
+
+    MANIFEST_NAME = 'manifest.json'
+
+    def __init__(
+        self,
+        store_dir: str = './thumbnails',
+        max_workers: int = 8,
+        small_size: Optional[int] = 200,
+        timeout: float = 15
+    ):
+        self.store_dir = Path(store_dir)
+        self.max_workers = max_workers
+        self.small_size = small_size if Image is not None else None
+        self.timeout = timeout
+        self.session = self._create_session()
+        self._lock = threading.Lock()
+        # Спільний пул для всіх викликів fetch_all: паралельність обмежена max_workers
+        # навіть коли fetch_all викликають кілька потоків демона одночасно
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbnail')
+        self._manifest = self._load_manifest()
+
+        if small_size and Image is None:
+            logger.warning("Pillow is not installed, resized thumbnails and dimensions are disabled")
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        retry_strategy = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"]
+        )
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=self.max_workers,
+            pool_maxsize=self.max_workers
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+        })
+        return session
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        path = self.store_dir / self.MANIFEST_NAME
+        if not path.exists():
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot read thumbnail manifest {path}: {str(e)}")
+            return {}
+
+    def _save_manifest(self) -> None:
+        path = self.store_dir / self.MANIFEST_NAME
+        # Унікальне тимчасове ім'я: маніфест можуть зберігати кілька процесів одночасно
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+
+    def _blob_path(self, digest: str, suffix: str, variant: str = '') -> Path:
+        name = f"{digest}{variant}{suffix}"
+        return self.store_dir / digest[:2] / name
+
+    def _write_once(self, path: Path, data: bytes) -> None:
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _process_image(self, data: bytes, digest: str) -> Dict[str, Any]:
+        info: Dict[str, Any] = {'width': None, 'height': None, 'small_path': None}
+        if Image is None:
+            return info
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                info['width'], info['height'] = img.size
+                if self.small_size:
+                    small_path = self._blob_path(digest, '.jpg', f"_{self.small_size}")
+                    if not small_path.exists():
+                        small = img.convert('RGB')
+                        small.thumbnail((self.small_size, self.small_size))
+                        buffer = io.BytesIO()
+                        small.save(buffer, format='JPEG', quality=85)
+                        self._write_once(small_path, buffer.getvalue())
+                    info['small_path'] = str(small_path)
+        except Exception as e:
+            logger.warning(f"Cannot decode thumbnail {digest}: {str(e)}")
+        return info
+
+    def fetch(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cached = self._manifest.get(url)
+
+        headers = {}
+        if cached and Path(cached['path']).exists():
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                logger.debug("Thumbnail not modified: %s", url, extra={'event': 'thumbnail'})
+                return cached
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f"Error downloading thumbnail {url}: {str(e)}")
+            return cached if cached and Path(cached['path']).exists() else None
+
+        data = response.content
+        digest = hashlib.sha256(data).hexdigest()
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+        suffix = _CONTENT_TYPES.get(content_type) or Path(url.split('?')[0]).suffix or '.img'
+        path = self._blob_path(digest, suffix)
+        self._write_once(path, data)
+
+        entry = {
+            'sha256': digest,
+            'path': str(path),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        entry.update(self._process_image(data, digest))
+
+        with self._lock:
+            self._manifest[url] = entry
+        logger.debug("Stored thumbnail %s as %s", url, path, extra={'event': 'thumbnail'})
+        return entry
+
+    def fetch_all(self, urls: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        unique_urls = list(dict.fromkeys(u for u in urls if u))
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        if not unique_urls:
+            return results
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        for url, entry in zip(unique_urls, self._executor.map(self.fetch, unique_urls)):
+            results[url] = entry
+
+        self._save_manifest()
+        return results
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def process(self, leaflets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fetches the thumbnails of all leaflets and adds the local path,
+        dimensions and resized variant to each record in place.
+        """
+        results = self.fetch_all([leaflet.get('thumbnail', '') for leaflet in leaflets])
+        stored = 0
+        for leaflet in leaflets:
+            entry = results.get(leaflet.get('thumbnail', ''))
+            if not entry:
+                continue
+            leaflet['thumbnail_path'] = entry['path']
+            leaflet['thumbnail_width'] = entry.get('width')
+            leaflet['thumbnail_height'] = entry.get('height')
+            leaflet['thumbnail_small_path'] = entry.get('small_path')
+            stored += 1
+
+        unique_blobs = len({entry['sha256'] for entry in results.values() if entry})
+        logger.info(f"Thumbnails: {stored} leaflets, {len(results)} URLs, {unique_blobs} unique images")
+        return leaflets
@@ -6,11 +6,6 @@ import logging
 from datetime import datetime
 from typing import Tuple, Optional
 
-# Налаштування логування
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger('prospekt_scraper')
 
 
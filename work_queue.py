@@ -0,0 +1,358 @@
+"""
+A module with a SQLite-backed work queue for crawling with several workers,
+per-worker result shards and a merge step.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Callable
+
+from exporters import export_leaflets
+
+logger = logging.getLogger('prospekt_scraper')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, lease_expires);
+"""
+
+
+class WorkQueue:
+    """
+    URLs to crawl, stored in a SQLite file that all workers open. A worker
+    claims an item with a lease and extends it with heartbeats; items whose
+    lease expired (the worker died or lost the filesystem) are claimed again.
+    Lease times use the wall clock (`clock`), so the hosts' clocks must be in sync.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        lease_seconds: float = 120,
+        max_attempts: int = 3,
+        clock: Callable[[], float] = time.time
+    ):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Окреме з'єднання на операцію: з'єднання SQLite не можна ділити між потоками,
+        # а WAL не працює на мережевих файлових системах, тому лишається rollback-журнал
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, urls: List[str], requeue: bool = False) -> int:
+        """
+        Adds URLs as pending. Already known URLs are left as they are unless
+        `requeue` is set, in which case finished and failed ones become pending again.
+        """
+        now = self.clock()
+        added = 0
+        with self._transaction() as conn:
+            for url in urls:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO items (url, updated) VALUES (?, ?)", (url, now)
+                )
+                added += cursor.rowcount
+                if requeue and not cursor.rowcount:
+                    conn.execute(
+                        "UPDATE items SET status = 'pending', attempts = 0, owner = NULL, lease_expires = NULL, "
+                        "updated = ? WHERE url = ? AND status IN ('done', 'failed')",
+                        (now, url)
+                    )
+        return added
+
+    def claim(self, worker_id: str) -> Optional[str]:
+        now = self.clock()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT url, status FROM items "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ? "
+                "ORDER BY status = 'leased', updated LIMIT 1",
+                (now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                # Прострочені оренди, для яких вичерпано спроби
+                conn.execute(
+                    "UPDATE items SET status = 'failed', owner = NULL, updated = ? "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                return None
+
+            url, status = row
+            if status == 'leased':
+                logger.warning(f"Lease expired, requeueing {url}")
+            conn.execute(
+                "UPDATE items SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated = ? WHERE url = ?",
+                (worker_id, now + self.lease_seconds, now, url)
+            )
+        return url
+
+    def heartbeat(self, url: str, worker_id: str) -> bool:
+        """
+        Extends the lease. Returns False if the lease was lost to another worker.
+        """
+        now = self.clock()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE items SET lease_expires = ?, updated = ? WHERE url = ? AND owner = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, url, worker_id)
+            )
+            extended = cursor.rowcount == 1
+        return extended
+
+    def complete(self, url: str, worker_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE items SET status = 'done', owner = NULL, lease_expires = NULL, last_error = NULL, "
+                "updated = ? WHERE url = ? AND owner = ?",
+                (self.clock(), url, worker_id)
+            )
+
+    def fail(self, url: str, worker_id: str, error: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_expires = NULL, last_error = ?, updated = ? WHERE url = ? AND owner = ?",
+                (self.max_attempts, error, self.clock(), url, worker_id)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall()
+        return dict(rows)
+
+    def has_open_items(self) -> bool:
+        stats = self.stats()
+        return bool(stats.get('pending') or stats.get('leased'))
+
+
+class CrawlWorker:
+    """
+    Claims URLs from a `WorkQueue`, crawls them and appends the leaflets to its
+    own JSON Lines shard, so workers never write to the same file.
+    """
+
+    def __init__(
+        self,
+        work_queue: WorkQueue,
+        shard_dir: str,
+        worker_id: Optional[str] = None,
+        poll_interval: float = 5
+    ):
+        self.queue = work_queue
+        self.shard_dir = Path(shard_dir)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval
+        self.shard_path = self.shard_dir / f"{self.worker_id}.jsonl"
+        self._session = None
+        self._playwright = None
+        self._browser = None
+
+    def _get_browser(self):
+        # Один браузер на процес воркера, запускається при першому зверненні
+        if self._browser is None:
+            from playwright.sync_api import sync_playwright
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch(headless=True)
+            logger.info("Browser started")
+        return self._browser
+
+    def _close_browser(self) -> None:
+        try:
+            if self._browser is not None:
+                self._browser.close()
+            if self._playwright is not None:
+                self._playwright.stop()
+        except Exception as e:
+            logger.error(f"Error closing the browser: {str(e)}")
+        finally:
+            self._browser = None
+            self._playwright = None
+
+    def _crawl(self, url: str) -> List[Dict[str, Any]]:
+        from scraper import Scraper, LeafletScraper, create_session
+
+        if self._session is None:
+            self._session = create_session()
+        leaflets = Scraper(url, session=self._session, dump_html=False).parse_leaflets()
+        if not leaflets:
+            logger.info(f"Attempting to retrieve prospectuses using Playwright for {url}")
+            fallback = LeafletScraper(url, session=self._session, browser=self._get_browser(), dump_html=False)
+            soup = fallback.get_page(url)
+            leaflets = fallback.extract_leaflets(soup) if soup else []
+        return leaflets
+
+    def _heartbeat_loop(self, url: str, done: threading.Event, lost: threading.Event) -> None:
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while not done.wait(interval):
+            try:
+                if not self.queue.heartbeat(url, self.worker_id):
+                    logger.warning(f"Lease lost for {url}")
+                    lost.set()
+                    return
+            except sqlite3.Error as e:
+                logger.error(f"Heartbeat error for {url}: {str(e)}")
+
+    def _write_shard(self, url: str, leaflets: List[Dict[str, Any]]) -> None:
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Усі записи одного обходу мають спільний ідентифікатор, щоб merge брав лише останній обхід URL
+        crawl_id = uuid.uuid4().hex
+        crawled_at = self.queue.clock()
+        with open(self.shard_path, 'a', encoding='utf-8') as f:
+            for leaflet in leaflets:
+                leaflet.setdefault("parsed_time", timestamp)
+                leaflet["source_url"] = url
+                leaflet["crawl_id"] = crawl_id
+                leaflet["crawled_at"] = crawled_at
+                f.write(json.dumps(leaflet, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def process(self, url: str) -> bool:
+        done, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(url, done, lost), daemon=True)
+        heartbeat.start()
+        try:
+            leaflets = self._crawl(url)
+        except Exception as e:
+            leaflets = []
+            logger.error(f"Error while scraping {url}: {str(e)}")
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if lost.is_set():
+            # Елемент уже забрав інший воркер; результат не записуємо
+            return False
+        if not leaflets:
+            self.queue.fail(url, self.worker_id, "no leaflets found")
+            return False
+
+        self._write_shard(url, leaflets)
+        self.queue.complete(url, self.worker_id)
+        logger.info(f"Crawled {url}: {len(leaflets)} leaflets")
+        return True
+
+    def run(self, wait: bool = False) -> int:
+        """
+        Processes items until the queue is drained. With `wait`, keeps polling
+        for new items instead of exiting.
+        """
+        logger.info(f"Worker {self.worker_id} started, shard {self.shard_path}")
+        processed = 0
+        try:
+            while True:
+                url = self.queue.claim(self.worker_id)
+                if url is not None:
+                    self.process(url)
+                    processed += 1
+                    continue
+                if not wait and not self.queue.has_open_items():
+                    break
+                # Інші воркери ще тримають оренди, які можуть прострочитися
+                time.sleep(self.poll_interval)
+        finally:
+            self._close_browser()
+            if self._session is not None:
+                self._session.close()
+        logger.info(f"Worker {self.worker_id} finished, {processed} items processed")
+        return processed
+
+
+def _dedup_key(leaflet: Dict[str, Any]) -> tuple:
+    return (
+        leaflet.get("title"), leaflet.get("shop_name"),
+        leaflet.get("valid_from"), leaflet.get("valid_to"), leaflet.get("thumbnail")
+    )
+
+
+def merge_shards(shard_dir: str, output_path: str) -> int:
+    """
+    Combines all worker shards into the JSON/JS exports. Only the records of
+    the latest crawl of each URL are kept, so leaflets that disappeared from a
+    page do not survive in older shards. Duplicates across URLs keep the most
+    recently parsed record. Returns -1 without touching the exports when the
+    shards hold no leaflets.
+    """
+    shards = sorted(Path(shard_dir).glob('*.jsonl'))
+    if not shards:
+        logger.error(f"No shards found in {shard_dir}, leaving {output_path} untouched")
+        return -1
+
+    latest: Dict[str, tuple] = {}
+    for shard in shards:
+        with open(shard, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    leaflet = json.loads(line)
+                except ValueError:
+                    # Обірваний останній рядок після падіння воркера
+                    logger.warning(f"Skipping broken line {line_number} in {shard}")
+                    continue
+                url = leaflet.get("source_url", "")
+                crawl = (leaflet.pop("crawled_at", 0), leaflet.pop("crawl_id", None) or f"{shard.name}:{url}")
+                current = latest.get(url)
+                if current is None or crawl > current[0]:
+                    latest[url] = (crawl, [leaflet])
+                elif crawl == current[0]:
+                    current[1].append(leaflet)
+
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for _, records in latest.values():
+        for leaflet in records:
+            key = _dedup_key(leaflet)
+            current = merged.get(key)
+            if current is None or leaflet.get("parsed_time", "") >= current.get("parsed_time", ""):
+                merged[key] = leaflet
+
+    leaflets = list(merged.values())
+    if not leaflets:
+        # Порожній результат не повинен затирати попередній експорт
+        logger.error(f"No leaflets found in the shards in {shard_dir}, leaving {output_path} untouched")
+        return -1
+    if not export_leaflets(leaflets, output_path):
+        return -1
+    logger.info(f"Merged {len(leaflets)} unique leaflets from {shard_dir}")
+    return len(leaflets)